@@ -15,19 +15,18 @@ from pathlib import Path
 from typing import List
 
 ## Third Party
+import bloscpack as bp
 import geopandas as gpd
 import numpy as np
 import pandas as pd
 import rasterio as rio
+from pyogrio import write_dataframe
 
 ## Project
 from data_processing.image_processing import create_temporal_chips_from_grid
 from shapely.geometry import box
 from truck_detection.feature_engineering import generate_training_data
-from utils.file_handling import generate_file_list
-
-## Third Party
-from yaml import Loader, load
+from utils.file_handling import generate_file_list, load_config
 
 
 def save_training_features(
@@ -36,15 +35,33 @@ def save_training_features(
     data_dir: Path,
     location: str,
 ):
-    """Write feature values to csv and stacked image to numpy compressed zip file."""
-    training_features.to_csv(
-        data_dir.joinpath(f"{location}_training_features.csv"), index=False
+    """Write feature values to Feather and stacked image to Blosc compressed file."""
+    # Feather with zstd is considerably faster to write and re-read than CSV
+    # and the features file is only ever consumed by this pipeline.
+    training_features.reset_index(drop=True).to_feather(
+        data_dir.joinpath(f"{location}_training_features.feather"), compression="zstd"
     )
-    stacked_imgs = np.stack(stacked_imgs)
-    np.savez_compressed(
-        data_dir.joinpath(f"{location}_stacked_img.npz"),
-        stacked_imgs=stacked_imgs,
+    # Copy the chips one at a time into an on-disk .npy memmap rather than
+    # materializing the whole stack in RAM with np.stack, then Blosc-pack the
+    # memmapped array (zstd + shuffle is far faster than the single-threaded
+    # zlib of np.savez_compressed). Peak memory stays around one chip.
+    memmap_fp = data_dir.joinpath(f"{location}_stacked_img.npy")
+    stacked = np.lib.format.open_memmap(
+        memmap_fp,
+        mode="w+",
+        dtype=stacked_imgs[0].dtype,
+        shape=(len(stacked_imgs),) + stacked_imgs[0].shape,
     )
+    for i, img in enumerate(stacked_imgs):
+        stacked[i] = img
+    stacked.flush()
+    bp.pack_ndarray_to_file(
+        stacked,
+        str(data_dir.joinpath(f"{location}_stacked_img.blp")),
+        blosc_args=bp.BloscArgs(cname="zstd", clevel=1, shuffle=True),
+    )
+    del stacked
+    memmap_fp.unlink()
 
 
 def main(location: str = None, num_trucks: str = None):
@@ -66,11 +83,13 @@ def main(location: str = None, num_trucks: str = None):
     data_dir = Path(__file__).resolve().parent.parent.joinpath("data", location)
     training_dir = data_dir.joinpath("processed", "training")
     if num_trucks:
-        df = pd.read_csv(training_dir.joinpath(f"{location}_training_features.csv"))
+        df = pd.read_feather(
+            training_dir.joinpath(f"{location}_training_features.feather")
+        )
         print(f"Number of labelled trucks in training data: {int(df.ml_class.sum())}")
     else:
         gdf = gpd.GeoDataFrame({"location": "training_area", "geometry": [geom]})
-        gdf.to_file(training_dir.joinpath("training_area_boundary.shp"))
+        write_dataframe(gdf, training_dir.joinpath("training_area_boundary.shp"))
         img_dir = data_dir.joinpath("processed", "s2_images")
         raster_list = generate_file_list(img_dir, "tif", [location])
         create_temporal_chips_from_grid(
@@ -85,8 +104,7 @@ def main(location: str = None, num_trucks: str = None):
         )
 
         #!! Ensure listed in date order or subsequent steps below will be incorrect
-        sorting_index = np.array([file.name for file in validation_points]).argsort()
-        validation_points = list(np.array(validation_points)[sorting_index])
+        validation_points = sorted(validation_points, key=lambda file: file.name)
 
         training_points, stacked_imgs = generate_training_data(
             validation_points, location, data_dir=training_dir
@@ -108,8 +126,7 @@ def mk_arg_pars():
     """
     import argparse
 
-    config_file = Path(__file__).resolve().parent.joinpath("config.yaml")
-    params = load(open(config_file), Loader=Loader)
+    params = load_config()
 
     parser = argparse.ArgumentParser(
         description="Process image and chip into smaller extents."
@@ -5,6 +5,7 @@ This is intended to be used in conjunction with the "extract_satellite_imagery"
 """
 
 # standard library
+import shutil
 import zipfile
 from pathlib import Path
 
@@ -14,6 +15,8 @@ import geopandas as gpd
 import pandas as pd
 import pyrosm
 import requests
+from osgeo import gdal
+from pyogrio import write_dataframe
 
 # project
 from utils.file_handling import set_data_dir
@@ -59,7 +62,7 @@ def get_roads_geometries(
 
     roads_export = roads[roads["highway"].isin(export_types)]
     if roads_export.shape[0] > 0:
-        roads_export.to_file(data_dir.joinpath(f"{location}_roads.shp"))
+        write_dataframe(roads_export, data_dir.joinpath(f"{location}_roads.shp"))
         print(f"Exported {osm_filepath}")
 
 
@@ -91,22 +94,12 @@ def dissolve_and_buffer_roads(
     road_centre_lines["geometry"] = road_centre_lines["geometry"].buffer(15)
 
     # save to new shapefile
-    road_centre_lines.to_file(
-        loc_data_dir.joinpath(f"{location}_buffered_roads_upload.shp")
+    write_dataframe(
+        road_centre_lines,
+        loc_data_dir.joinpath(f"{location}_buffered_roads_upload.shp"),
     )
 
 
-def get_image_info(img):
-    """Define a dictionary of data to extract from image and pass to ee.Feature()."""
-    row_val = {
-        "img_id": img.get("system:index"),
-        "date_time": img.date().format("yyyy-MM-dd HH:MM:SS"),
-        "cloudpercent": img.get("CLOUDY_PIXEL_PERCENTAGE"),
-        "satellite": img.get("SPACECRAFT_NAME"),
-    }
-    return ee.Feature(None, row_val)
-
-
 def image_datetime_df(
     xy_coords: tuple,
     start: str = "2019-01-01",
@@ -150,10 +143,20 @@ def image_datetime_df(
         .sort("system:time_start")
     )
 
-    feature_coll = ee.FeatureCollection(s2c.map(get_image_info))
-    property_list = [i["properties"] for i in feature_coll.getInfo()["features"]]
+    # Aggregate each property server side and fetch the lot in one getInfo
+    # call, rather than wrapping every image in an ee.Feature first.
+    payload = ee.Dictionary(
+        {
+            "img_id": s2c.aggregate_array("system:index"),
+            "date_time": s2c.aggregate_array("system:time_start").map(
+                lambda t: ee.Date(t).format("yyyy-MM-dd HH:MM:SS")
+            ),
+            "cloudpercent": s2c.aggregate_array("CLOUDY_PIXEL_PERCENTAGE"),
+            "satellite": s2c.aggregate_array("SPACECRAFT_NAME"),
+        }
+    ).getInfo()
 
-    return pd.DataFrame(property_list)
+    return pd.DataFrame(payload)
 
 
 def add_shadow_bands(img):
@@ -214,11 +217,6 @@ def add_shadow_bands(img):
     return img.addBands(shadows)
 
 
-def get_img_dates(img, tmp_list):
-    """Extract observation date from image."""
-    return ee.List(tmp_list).add(img.date().format("yyyy-MM-dd"))
-
-
 def export_s2_collection(
     prefix_out,
     crs,
@@ -269,7 +267,12 @@ def export_s2_collection(
 
     Returns
     -------
-    TIF images are exported and saved to specified location.
+    list(str)
+        The observation dates in the stacked export, in band order. TIF
+        images are exported and saved to the specified location; with
+        google_drive=True the export is a single stacked file, and the
+        returned dates should be passed to split_stacked_export once it
+        has been downloaded.
 
     """
     img_dir = set_data_dir(data_dir, "raw")
@@ -305,13 +308,24 @@ def export_s2_collection(
 
     s2cuse = s2cuse.map(add_shadow_bands)
 
-    tmp_list = ee.List([])
     # Doing it this way round as want all images mosaiced in AOI to have ..
     # .. cloud coverage < specified overall cloud cover percent
-    set_of_img_dates = set(s2cfull.iterate(get_img_dates, tmp_list).getInfo()) - set(
-        s2ccloud.iterate(get_img_dates, tmp_list).getInfo()
+    # Both date lists and their difference are computed server side, so only
+    # one getInfo round-trip is needed.
+    format_date = lambda t: ee.Date(t).format("yyyy-MM-dd")
+    full_dates = (
+        s2cfull.aggregate_array("system:time_start").map(format_date).distinct()
     )
+    cloud_dates = (
+        s2ccloud.aggregate_array("system:time_start").map(format_date).distinct()
+    )
+    set_of_img_dates = full_dates.removeAll(cloud_dates).getInfo()
     print(set_of_img_dates)
+    # All per-date mosaics are stacked into one multiband image and exported
+    # as a single task, rather than starting one export task per date. The
+    # stacked export is split back into per-date files locally with
+    # split_stacked_export (cheap compared to GEE task scheduling).
+    per_date_mosaics = []
     for img_date in set_of_img_dates:
         endd = ee.Date(img_date).advance(1, "day").format("yyyy-MM-dd").getInfo()
         outimg = (
@@ -327,37 +341,89 @@ def export_s2_collection(
 
         if mask:
             outimg = outimg.clipToCollection(geometry)
-        if google_drive:
-            task = ee.batch.Export.image.toDrive(
-                image=outimg.float().unmask(-999),
-                folder=folder_name,
-                description=f"s2a_{prefix_out}_{img_date}",
-                region=geometry.geometry(),
-                maxPixels=1e13,
-                crs=crs,
-                scale=10,
-            )
-            task.start()
-        else:
-            url = (
-                outimg.float()
-                .unmask(-999)
-                .getDownloadURL(
-                    {
-                        "name": f"s2a_{prefix_out}_{img_date}",
-                        "region": geometry.geometry(),
-                        "scale": 10,
-                        "crs": crs,
-                        "filePerBand": False,
-                    }
-                )
-            )
-            req = requests.get(url, stream=True)
+        per_date_mosaics.append(outimg.float().unmask(-999))
+
+    stacked_img = ee.ImageCollection.fromImages(per_date_mosaics).toBands()
+    if google_drive:
+        task = ee.batch.Export.image.toDrive(
+            image=stacked_img,
+            folder=folder_name,
+            description=f"s2a_{prefix_out}_stacked",
+            region=geometry.geometry(),
+            maxPixels=1e13,
+            crs=crs,
+            scale=10,
+        )
+        task.start()
+    else:
+        url = stacked_img.getDownloadURL(
+            {
+                "name": f"s2a_{prefix_out}_stacked",
+                "region": geometry.geometry(),
+                "scale": 10,
+                "crs": crs,
+                "filePerBand": False,
+            }
+        )
+        with requests.get(url, stream=True) as req:
+            req.raw.decode_content = True
             with open(data_dir.joinpath("temp_img.zip"), "wb") as file:
-                for chunk in req.iter_content(chunk_size=1024):
-                    file.write(chunk)
-            z = zipfile.ZipFile(data_dir.joinpath("temp_img.zip"))
-            z.extractall(img_dir)
-            print(
-                f"Exported image to {str(img_dir.joinpath(f's2a_{prefix_out}_{img_date}.tif'))}"
-            )
+                # Buffered C-level copy in 1 MiB chunks rather than a
+                # Python loop over 1 KiB chunks.
+                shutil.copyfileobj(req.raw, file, length=1 << 20)
+        z = zipfile.ZipFile(data_dir.joinpath("temp_img.zip"))
+        z.extractall(img_dir)
+        split_stacked_export(
+            img_dir.joinpath(f"s2a_{prefix_out}_stacked.tif"),
+            img_dir,
+            prefix_out,
+            set_of_img_dates,
+        )
+
+    return set_of_img_dates
+
+
+def split_stacked_export(
+    stacked_img_fp: Path, img_dir: Path, prefix_out: str, img_dates: list
+):
+    """
+    Split a stacked multi-date export back into one image file per date.
+
+    The stacked export produced by export_s2_collection holds the five bands
+    (B2, B3, B4, cloud probability, shadows) of every date consecutively. Each
+    date is extracted to its own "s2a_<prefix_out>_<date>.tif" file, matching
+    the layout of the previous per-date exports.
+
+    Parameters
+    ----------
+    stacked_img_fp : pathlib.Path
+        Path to the stacked multiband image exported from GEE.
+    img_dir : pathlib.Path
+        Directory where the per-date image files are to be saved.
+    prefix_out : str
+        Location descriptive name - used in naming files.
+    img_dates : list(str)
+        The observation dates in the stacked image, in band order (as returned
+        by export_s2_collection).
+
+    Returns
+    -------
+    Per-date TIF images created in place.
+
+    """
+    bands_per_date = 5
+    for i, img_date in enumerate(img_dates):
+        gdal.Translate(
+            str(img_dir.joinpath(f"s2a_{prefix_out}_{img_date}.tif")),
+            str(stacked_img_fp),
+            options=gdal.TranslateOptions(
+                format="GTiff",
+                bandList=list(
+                    range(i * bands_per_date + 1, (i + 1) * bands_per_date + 1)
+                ),
+                creationOptions=["COMPRESS=LZW"],
+            ),
+        )
+        print(
+            f"Exported image to {str(img_dir.joinpath(f's2a_{prefix_out}_{img_date}.tif'))}"
+        )
@@ -3,14 +3,50 @@ Collection of functions for handling road networks in image processing and
 masking clouds in image processing.
 """
 
+import math
+from functools import lru_cache
+
+import cv2
 import geopandas as gpd
 import numpy as np
 import osmnx
-import pandas as pd
+import pyproj
 import rasterio
-from shapely.geometry import box
-from skimage.filters.rank import maximum, minimum
-from skimage.morphology import square
+import shapely.ops
+from numba import njit, prange
+from rasterio.warp import transform_bounds
+
+# Cache Overpass responses on disk so re-runs for the same area skip the
+# network round-trip even across processes.
+osmnx.config(use_cache=True)
+
+
+@lru_cache(maxsize=64)
+def _graph_for_bbox(north: float, south: float, west: float, east: float):
+    """
+    Query the OSM street network for a bounding box, memoized per bbox.
+
+    The bbox coordinates should be pre-rounded by the caller so repeated
+    queries for effectively the same area hit the in-process cache instead of
+    re-requesting (and re-parsing) the Overpass response.
+    """
+    return osmnx.graph.graph_from_bbox(north, south, west, east)
+
+
+@njit(parallel=True, cache=True)
+def _merge_cloud_into_mask(cloud, mask):
+    """
+    OR a 2-D cloud mask into a 3-D band mask in place.
+
+    Fusing the broadcast into one parallel pass avoids the full-stack bool
+    temporary that ``np.logical_or(mask, cloud)`` would allocate.
+    """
+    bands, height, width = mask.shape
+    for i in prange(height):
+        for j in range(width):
+            if cloud[i, j]:
+                for b in range(bands):
+                    mask[b, i, j] = True
 
 
 def check_highway_type(
@@ -36,17 +72,14 @@ def check_highway_type(
         Filtered network including only given road types.
     """
     highway_links = [highway + "_link" for highway in acceptable_highways]
-    acceptable_highways = acceptable_highways + highway_links
-
-    network_highway = pd.DataFrame(columns=network.columns)
+    acceptable_highways = set(acceptable_highways + highway_links)
 
-    for highway in acceptable_highways:
-        highway_df = network[
-            network["highway"].apply(lambda x: highway == x or highway in x)
-        ]
-        network_highway = pd.concat([network_highway, highway_df])
-
-    return network_highway
+    # The highway column can hold a string or a list of strings. Exploding
+    # flattens both cases so one vectorized isin plus a per-row any() replaces
+    # the per-type apply-and-concat loop (which also duplicated rows matching
+    # more than one accepted type).
+    matches = network["highway"].explode().isin(acceptable_highways)
+    return network[matches.groupby(level=0).any()]
 
 
 def get_roads(
@@ -80,17 +113,22 @@ def get_roads(
 
     """
     if img.crs.to_string() != "EPSG:4326":
-        minx, miny, maxx, maxy = img.bounds
-        g = box(minx, miny, maxx, maxy)
-        temp_gdf = gpd.GeoDataFrame(geometry=[g], crs=img.crs.to_string())
-        temp_gdf = temp_gdf.to_crs("EPSG:4326")
-        minx, miny, maxx, maxy = temp_gdf["geometry"][0].bounds
-
+        # Push the four corner points through pyproj directly instead of
+        # building a throwaway GeoDataFrame just to reproject the bbox.
+        minx, miny, maxx, maxy = transform_bounds(img.crs, "EPSG:4326", *img.bounds)
     else:
         minx, miny, maxx, maxy = img.bounds
 
-    # north south east west order
-    network = osmnx.graph.graph_from_bbox(maxy, miny, minx, maxx)
+    # north south east west order. The bbox is rounded outward (ceil on the
+    # max edges, floor on the min edges) so the cached extent always covers
+    # the requested one - rounding to nearest could shrink an edge by up to
+    # ~11 m and drop roads near the image boundary.
+    network = _graph_for_bbox(
+        math.ceil(maxy * 1e4) / 1e4,
+        math.floor(miny * 1e4) / 1e4,
+        math.floor(minx * 1e4) / 1e4,
+        math.ceil(maxx * 1e4) / 1e4,
+    )
     nodes, roads = osmnx.graph_to_gdfs(network, network_type)
 
     crs = roads.crs
@@ -103,10 +141,13 @@ def get_roads(
     highways_gdf.to_crs(projected_crs, inplace=True)
     highways_union = highways_gdf.unary_union.buffer(buffer_distance)
 
-    highways_gdf = gpd.GeoDataFrame(crs=highways_gdf.crs, geometry=[highways_union])
-    highways_gdf.to_crs(crs, inplace=True)
+    # Buffering collapsed the network to a single (multi)polygon, so only
+    # that one geometry needs projecting back rather than a full-table
+    # to_crs pass.
+    transformer = pyproj.Transformer.from_crs(projected_crs, crs, always_xy=True)
+    highways_union = shapely.ops.transform(transformer.transform, highways_union)
 
-    return highways_gdf
+    return gpd.GeoDataFrame(crs=crs, geometry=[highways_union])
 
 
 def cloud_mask(
@@ -114,14 +155,18 @@ def cloud_mask(
     threshold: int = 25,
     expand_edge: int = 100,
     mask_shadow: bool = True,
+    use_gpu: bool = False,
 ):
     """
     Masks pixels with cloud probability above given threshold.
 
     Parameters
     ----------
-    img : np.ndarray
-        Array representation of raster to be processed.
+    img : np.ma.MaskedArray or rasterio.io.DatasetReader
+        Array representation of raster to be processed, or an open dataset.
+        Passing the dataset is cheaper for large tiles: only the cloud
+        probability and shadow bands are read to build the mask, and the
+        remaining bands are read (masked) in a single pass afterwards.
     threshold : int, optional
         The cloud probability threshold above which pixels are masked. The
         default value is 25 (i.e. 25% probability).
@@ -132,6 +177,10 @@ def cloud_mask(
     mask_shadow : bool, optional
         Decides whether to also mask the shadow caused by clouds. The default
         behaviour is True.
+    use_gpu : bool, optional
+        If True, run the mask morphology on the GPU. This needs the optional
+        cupy and cucim packages (and a CUDA device) and pays off on full
+        Sentinel-2 tiles rather than small chips. The default is False.
 
     Returns
     -------
@@ -141,14 +190,54 @@ def cloud_mask(
         by expand_edge).
 
     """
-    initial_mask = img.mask
-    cloud = img[3].astype("uint8")
-    cloud = np.where(cloud > threshold, 1, 0)
+    if isinstance(img, rasterio.io.DatasetReader):
+        # Only the two bands the mask depends on are pulled through GDAL here;
+        # the rest of the stack is read once the mask is known.
+        src = img
+        cloud_band = src.read(4, masked=True)
+        shadow_band = src.read(5) if mask_shadow else None
+        img = None
+    else:
+        src = None
+        cloud_band = img[3]
+        shadow_band = img[4].data if mask_shadow else None
+
+    nodata = np.ma.getmaskarray(cloud_band)
+    # One SIMD comparison straight to uint8 - np.where(cond, 1, 0) allocated
+    # an int64 intermediate eight times the size. The shadow merge of two 0/1
+    # arrays is a bitwise or.
+    cloud = (cloud_band.data > threshold).view(np.uint8)
     if mask_shadow:
-        shadow = img[4].astype("uint8")
-        cloud = np.maximum(cloud, shadow)
-    cloud = minimum(cloud, square(3), mask=~img[3].mask)
-    cloud = maximum(cloud, square(expand_edge), mask=~img[3].mask)
-    cloud = np.broadcast_to(cloud == 1, img.shape)
-    img = np.ma.masked_where(np.logical_or(cloud, initial_mask), img)
+        np.bitwise_or(cloud, (shadow_band > 0).view(np.uint8), out=cloud)
+    # OpenCV's separable erode/dilate are orders of magnitude faster than the
+    # skimage rank filters for the large square footprints used here. cv2 has
+    # no mask argument, so nodata pixels are zeroed before and after instead.
+    cloud = np.ascontiguousarray(np.where(nodata, 0, cloud))
+    if use_gpu:
+        # Imported here so cupy/cucim stay optional dependencies.
+        import cupy as cp
+        from cucim.skimage.morphology import dilation, erosion
+
+        cloud_gpu = cp.asarray(cloud)
+        cloud_gpu = erosion(cloud_gpu, cp.ones((3, 3), dtype=cp.uint8))
+        cloud_gpu = dilation(
+            cloud_gpu, cp.ones((expand_edge, expand_edge), dtype=cp.uint8)
+        )
+        cloud = cp.asnumpy(cloud_gpu)
+    else:
+        cloud = cv2.erode(cloud, cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3)))
+        # Dilation by a square decomposes into a horizontal then a vertical
+        # 1-D pass, turning O(k^2) comparisons per pixel into O(2k).
+        cloud = cv2.dilate(
+            cloud, cv2.getStructuringElement(cv2.MORPH_RECT, (expand_edge, 1))
+        )
+        cloud = cv2.dilate(
+            cloud, cv2.getStructuringElement(cv2.MORPH_RECT, (1, expand_edge))
+        )
+    cloud = np.where(nodata, 0, cloud)
+    if src is not None:
+        img = src.read(masked=True)
+    if img.mask is np.ma.nomask:
+        img.mask = np.zeros(img.shape, dtype=bool)
+    _merge_cloud_into_mask(cloud, np.ma.getmaskarray(img))
     return img
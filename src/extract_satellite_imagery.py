@@ -58,6 +58,7 @@ to acquire the required Sentinel-2 imagery data.
 #     export_s2_collection,
 #     get_roads_geometries,
 #     image_datetime_df,
+#     split_stacked_export,
 # )
 # from utils.file_handling import set_up_data_structure
 #
@@ -215,7 +216,9 @@ to acquire the required Sentinel-2 imagery data.
 # + tags=["active-ipynb"]
 # gee_asset_path = input("Enter path to GEE asset:")
 # feature = ee.FeatureCollection(gee_asset_path)
-# export_s2_collection(
+# # The returned dates are needed below to split the stacked export back
+# # into one image file per observation date.
+# img_dates = export_s2_collection(
 #     prefix_out=location,
 #     crs=crs,
 #     geometry=feature,
@@ -238,9 +241,21 @@ to acquire the required Sentinel-2 imagery data.
 # -
 
 # ## Download image files from Drive to local raw data directory
-# By default, GEE will have exported the S2 satellite images to the associated Google Drive (with the folder name defined above, or the default "S2_road_images").
+# By default, GEE will have exported the S2 satellite images to the associated Google Drive (with the folder name defined above, or the default "S2_road_images") as a single stacked TIF named `s2a_<location_name>_stacked.tif`, holding the five bands of every observation date.
 #
-# These now need to be downloaded and the TIF images relocated to the `s2_images` subdirectory in the `raw` subdirectory within the location specific data directory (i.e. `data/<location_name>/raw/s2_images`).
+# This now needs to be downloaded and relocated to the `s2_images` subdirectory in the `raw` subdirectory within the location specific data directory (i.e. `data/<location_name>/raw/s2_images`).
+#
+# Once the stacked TIF is in place, run the cell below to split it back into the per-date image files (`s2a_<location_name>_<date>.tif`) expected by the rest of the pipeline:
+
+# + tags=["active-ipynb"]
+# raw_img_dir = loc_data_dir.joinpath("raw", "s2_images")
+# split_stacked_export(
+#     raw_img_dir.joinpath(f"s2a_{location}_stacked.tif"),
+#     raw_img_dir,
+#     location,
+#     img_dates,
+# )
+# -
 
 # ## Your images are now ready for further processing and model implementation.
 #
@@ -29,12 +29,14 @@ new files
 """
 
 # Standard Library
-import pickle
 import re
 import warnings
 from datetime import datetime
 from pathlib import Path
 
+## Third Party
+import joblib
+
 ## Project
 from truck_detection.cloud_time_series import (
     apply_correction_for_cloud,
@@ -44,10 +46,10 @@ from truck_detection.detect_trucks import (
     predict_trucks_across_all,
     predict_trucks_single_date,
 )
-from utils.file_handling import generate_file_list, set_data_dir
+from utils.file_handling import generate_file_list, load_config, set_data_dir
 
-## Third Party
-from yaml import Loader, load
+
+_DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})")
 
 
 def main(location: str = None, test_date: str = None):
@@ -90,12 +92,17 @@ def main(location: str = None, test_date: str = None):
     whole_image_list = generate_file_list(
         data_dir.joinpath("s2_images"), "tif", [location]
     )
-    list_of_dates = [re.findall(r"(\d+-\d+-\d+)", str(img)) for img in whole_image_list]
-
-    with open(models_dir.joinpath("trained_model.pkl"), "rb") as file:
-        model = pickle.load(file)
-    with open(models_dir.joinpath("scaler.pkl"), "rb") as file:
-        scaler = pickle.load(file)
+    list_of_dates = [
+        match.group(0)
+        for match in (_DATE_PATTERN.search(img.name) for img in whole_image_list)
+        if match
+    ]
+
+    # The model is dumped lz4-compressed by train_model; joblib decompresses
+    # the tree arrays straight into their buffers (compressed archives cannot
+    # be memory-mapped, so no mmap_mode here).
+    model = joblib.load(models_dir.joinpath("trained_model.pkl"))
+    scaler = joblib.load(models_dir.joinpath("scaler.pkl"))
 
     if test_date:
         datetime.strptime(test_date, "%Y-%m-%d")
@@ -128,8 +135,7 @@ def mk_arg_pars():
     """
     import argparse
 
-    config_file = Path(__file__).resolve().parent.joinpath("config.yaml")
-    params = load(open(config_file), Loader=Loader)
+    params = load_config()
 
     parser = argparse.ArgumentParser(
         description="Process image and chip into smaller extents."
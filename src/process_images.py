@@ -18,6 +18,7 @@ functionality of this script in normal mode has been previously run and the
 necessary grid shapefile exist.
 """
 # Standard library
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Third party
@@ -31,10 +32,13 @@ from data_processing.image_processing import (
     create_temporal_chips_from_grid,
     generate_grid_shp,
 )
-from utils.file_handling import generate_file_list, set_data_dir
+from utils.file_handling import generate_file_list, load_config, set_data_dir
 
-## Third Party
-from yaml import Loader, load
+
+def _label_bands(raster: Path):
+    """Set the band descriptions of one raster in place."""
+    with rio.open(raster, "r+") as img:
+        img.descriptions = tuple(["Blue", "Green", "Red", "Cloud", "Cloud Shadow"])
 
 
 def main(location: str = None, date: str = None, chip_focussed: str = None):
@@ -103,11 +107,10 @@ def main(location: str = None, date: str = None, chip_focussed: str = None):
 
         raster_list = generate_file_list(img_dir, "tif", [location])
         print("Labelling bands in rasters.")
-        for raster in raster_list:
-            with rio.open(raster, "r+") as img:
-                img.descriptions = tuple(
-                    ["Blue", "Green", "Red", "Cloud", "Cloud Shadow"]
-                )
+        # Per-raster metadata edits are independent, so they fan out across
+        # workers (each opening its own handle) rather than running serially.
+        with ProcessPoolExecutor() as executor:
+            list(executor.map(_label_bands, raster_list))
 
         print("\nGenerating the grid shapefile for chipping.")
         generate_grid_shp(
@@ -124,30 +127,23 @@ def main(location: str = None, date: str = None, chip_focussed: str = None):
         print("\nGenerated grid shapefile.")
 
         chips_img_dir = set_data_dir(chips_dir, date + "_chip_imgs")
-        create_chips_from_grid(
+        single_observation_chips = create_chips_from_grid(
             raster_file=img_file,
             grid_shp_fp=chips_dir.joinpath(f"grids_use_{location}.shp"),
             chip_output_fp=chips_img_dir.joinpath(f"s2a_{location}_{date}_"),
         )
         print("\nGenerated chipped image files.")
 
-        imgs = generate_file_list(img_dir, "tif", [location])
-
-        create_temporal_chips_from_grid(
-            img_file_list=imgs,
+        # The chipping functions report what they wrote and raster_list is
+        # still current, so the directories are not re-scanned here.
+        temporal_mean_chips = create_temporal_chips_from_grid(
+            img_file_list=raster_list,
             chips_temporal_dir=chips_temporal_dir,
             grid_shp_fp=chips_dir.joinpath(f"grids_use_{location}.shp"),
             output_partial_filename=f"s2a_{location}_temporal_mean_",
         )
         print("\nGenerated temporal mean chipped image files.")
 
-        single_observation_chips = generate_file_list(
-            chips_img_dir, "tif", [location, date]
-        )
-        temporal_mean_chips = generate_file_list(
-            chips_temporal_dir, "tif", [location, "temporal_mean"]
-        )
-
         # Check the number of chipped images and temporal mean chipped images are equal
         print(
             f"There are {len(single_observation_chips)} chips for the single date "
@@ -168,8 +164,7 @@ def mk_arg_pars():
     """
     import argparse
 
-    config_file = Path(__file__).resolve().parent.joinpath("config.yaml")
-    params = load(open(config_file), Loader=Loader)
+    params = load_config()
 
     parser = argparse.ArgumentParser(
         description="Process image and chip into smaller extents."
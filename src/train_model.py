@@ -13,7 +13,6 @@ cross validation, and return a AUCPR visual.
 """
 
 # Standard Library
-import pickle
 from pathlib import Path
 
 ## Third Party
@@ -21,8 +20,15 @@ import matplotlib as mpl
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
+import joblib
 from imblearn.ensemble import BalancedRandomForestClassifier
-from sklearn.ensemble import RandomForestClassifier
+from joblib import Memory
+from pyarrow import csv as pa_csv
+from sklearn.base import clone
+from sklearn.ensemble import (
+    HistGradientBoostingClassifier,
+    RandomForestClassifier,
+)
 from sklearn.metrics import auc, classification_report, precision_recall_curve
 from sklearn.model_selection import StratifiedKFold
 from sklearn.preprocessing import StandardScaler
@@ -30,8 +36,7 @@ from sklearn.utils import shuffle
 
 # Project
 from utils.column_headers import define_training_data_column_headers
-from utils.file_handling import set_data_dir
-from yaml import Loader, load
+from utils.file_handling import load_config, set_data_dir
 
 
 def read_training_features(
@@ -64,12 +69,15 @@ def read_training_features(
             .resolve()
             .parent.parent.joinpath("data", "preprepared_training_data")
         )
-        features = pd.read_csv(
+        # Arrow parses the CSVs with multiple threads straight into typed
+        # columnar buffers; the pandas pin predates its engine="pyarrow"
+        # option so the Arrow reader is called directly.
+        features = pa_csv.read_csv(
             training_data_filepath.joinpath("nairobi_training_features.csv")
-        )
-        more_features = pd.read_csv(
+        ).to_pandas()
+        more_features = pa_csv.read_csv(
             training_data_filepath.joinpath("nairobi2_training_features.csv")
-        )
+        ).to_pandas()
         train_features = pd.concat([features, more_features])
     else:
         training_data = (
@@ -80,15 +88,15 @@ def read_training_features(
                 location,
                 "processed",
                 "training",
-                location + "_training_features.csv",
+                location + "_training_features.feather",
             )
         )
-        train_features = pd.read_csv(training_data)
+        train_features = pd.read_feather(training_data)
     return train_features
 
 
 def reduce_non_truck_sample(
-    features: pd.DataFrame, non_truck_multiple: int = 100
+    features: pd.DataFrame, non_truck_multiple: int = 100, seed: int = None
 ) -> pd.DataFrame:
     """
     Control ratio between number of truck and non-truck positions in training data.
@@ -102,6 +110,9 @@ def reduce_non_truck_sample(
         Controls the multiplication factor for truck to non-truck positions.
         For example, the default value of 100 will return a training dataset of
         maximum 100 non-truck pixels for every one truck pixel. The default is 100.
+    seed : int, optional
+        Seed for the subsampling generator, for reproducible draws. The
+        default is None (a fresh random draw each call).
 
     Returns
     -------
@@ -117,18 +128,37 @@ def reduce_non_truck_sample(
     https://datasciencecampus.ons.gov.uk/detecting-trucks-in-east-africa/
 
     """
-    count = lambda x: len(features[features["ml_class"] == x])
-    truck_count = count(1)
-    non_truck_count = count(0)
-    print(f"{truck_count} trucks and {non_truck_count} non-trucks initially.")
-    if (non_truck_count / truck_count) > non_truck_multiple:
-        max_non_trucks = truck_count * non_truck_multiple
-        non_truck_df = features[features["ml_class"] == 0].sample(max_non_trucks)
-        features = pd.concat([features[features["ml_class"] == 1], non_truck_df])
-    print(f"Downsampling complete: {count(1)} trucks and {count(0)} non-trucks.")
+    # One scan of the label column gives both class index sets; the repeated
+    # boolean filters each rescanned (and copied from) the full table.
+    ml_class = features["ml_class"].to_numpy()
+    truck_idx = np.flatnonzero(ml_class == 1)
+    non_truck_idx = np.flatnonzero(ml_class == 0)
+    print(f"{len(truck_idx)} trucks and {len(non_truck_idx)} non-trucks initially.")
+    if (len(non_truck_idx) / len(truck_idx)) > non_truck_multiple:
+        max_non_trucks = len(truck_idx) * non_truck_multiple
+        # shuffle=False lets the generator use a partial Fisher-Yates draw
+        # instead of permuting the full index array.
+        non_truck_idx = np.random.default_rng(seed).choice(
+            non_truck_idx, size=max_non_trucks, replace=False, shuffle=False
+        )
+        features = features.iloc[np.concatenate([truck_idx, non_truck_idx])]
+    print(
+        f"Downsampling complete: {len(truck_idx)} trucks and "
+        f"{len(non_truck_idx)} non-trucks."
+    )
     return features
 
 
+def _fit_predict_fold(classifier, X_train, y_train, X_test):
+    """Fit one CV fold and return its probabilities and class predictions."""
+    # The estimator is cloned so the fit never mutates the argument: the
+    # cache key is built from the unfitted estimator's parameters and the
+    # fold data, and stays identical from one run to the next.
+    classifier = clone(classifier)
+    classifier.fit(X_train, y_train)
+    return classifier.predict_proba(X_test), classifier.predict(X_test)
+
+
 def model_selection_evaluation(
     outputs_dir: Path,
     features: pd.DataFrame,
@@ -152,7 +182,7 @@ def model_selection_evaluation(
         Dataframe of feature values in training dataset.
     classifier_model : str
         The classification model to evaluate. Acceptable options are:
-        "Random Forest" or "Balanced Random Forest"
+        "Random Forest", "Balanced Random Forest" or "HistGBT"
     columns_use : list
         A list of features which feed into the classifier model. It is suggested
         to use the full set of features available in the features data frame. But
@@ -186,19 +216,39 @@ def model_selection_evaluation(
             features, non_truck_multiple=sample_non_truck_factor
         )
 
-    y = np.array(features["ml_class"])
-    X = features[columns_use]
-    X, y = shuffle(X, y)
-    sc = StandardScaler()
-    X = sc.fit_transform(X)
+    # sklearn's tree builder works on contiguous float32 internally, so
+    # handing it float32 up front avoids the hidden float64 conversion copy.
+    y = features["ml_class"].to_numpy(dtype=np.int8)
+    X = np.ascontiguousarray(features[columns_use].to_numpy(dtype=np.float32))
+    # The shuffle is seeded so the folds (and therefore the cached fits
+    # below) are identical between runs.
+    X, y = shuffle(X, y, random_state=99)
+    if classifier_model not in ("Random Forest", "Balanced Random Forest"):
+        X = StandardScaler().fit_transform(X)
+
+    # Re-running the evaluation to tweak sampling ratios or plot styling
+    # repeats every fold fit; memoising on the fold data and classifier
+    # params makes those re-runs near free.
+    memory = Memory(outputs_dir.joinpath("cache"), verbose=0)
+    fit_predict_fold = memory.cache(_fit_predict_fold)
 
     # Choose cross validation procedure and classifier type
     cv = StratifiedKFold(n_splits=K, shuffle=True, random_state=1)
+    # Trees are independent, so fitting and prediction parallelize across
+    # all cores.
     if classifier_model == "Random Forest":
-        classifier = RandomForestClassifier(n_estimators=rf_num_trees, random_state=99)
+        classifier = RandomForestClassifier(
+            n_estimators=rf_num_trees, random_state=99, n_jobs=-1
+        )
     elif classifier_model == "Balanced Random Forest":
         classifier = BalancedRandomForestClassifier(
-            n_estimators=rf_num_trees, random_state=99
+            n_estimators=rf_num_trees, random_state=99, n_jobs=-1
+        )
+    elif classifier_model == "HistGBT":
+        # Histogram gradient boosting bins the features to uint8 histograms,
+        # typically fitting far faster than a forest of comparable accuracy.
+        classifier = HistGradientBoostingClassifier(
+            max_iter=rf_num_trees, max_bins=255, early_stopping=True, random_state=99
         )
 
     mpl.rcParams["axes.linewidth"] = 3
@@ -209,7 +259,7 @@ def model_selection_evaluation(
     mean_recall = np.linspace(0, 1, 100)
 
     for i, (train, test) in enumerate(cv.split(X, y)):
-        probas_ = classifier.fit(X[train], y[train]).predict_proba(X[test])
+        probas_, y_pred = fit_predict_fold(classifier, X[train], y[train], X[test])
         precision, recall, thresholds = precision_recall_curve(y[test], probas_[:, 1])
         prs.append(np.interp(mean_recall, precision, recall))
         pr_auc = auc(recall, precision)
@@ -222,7 +272,6 @@ def model_selection_evaluation(
             label="Fold %d (AUCPR = %0.2f)" % (i + 1, pr_auc),
         )
 
-        y_pred = classifier.predict(X[test])
         print("P.R. AUC =", pr_auc)
         print(classification_report(y[test], y_pred))
 
@@ -275,7 +324,8 @@ def train_model(
         Dataframe of feature values in training dataset.
     classifier_model : str
         The classification model to be used. Current acceptable options are:
-        "Random Forest" or "Balanced Random Forest". However, the function could
+        "Random Forest", "Balanced Random Forest" or "HistGBT" (histogram
+        gradient boosting). However, the function could
         be adapted as desired to experiment with additional models.
     columns_use : list
         A list of features which feed into the classifier model. It is suggested
@@ -300,35 +350,47 @@ def train_model(
             features, non_truck_multiple=sample_non_truck_factor
         )
 
-    y = np.array(features["ml_class"])
-    X = features[columns_use]
+    y = features["ml_class"].to_numpy(dtype=np.int8)
+    X = np.ascontiguousarray(features[columns_use].to_numpy(dtype=np.float32))
     X, y = shuffle(X, y)
-    sc = StandardScaler()
-    X = sc.fit_transform(X)
+    if classifier_model in ("Random Forest", "Balanced Random Forest"):
+        # Scaling is a no-op for the forest models; fit an identity scaler so
+        # the prediction pipeline can keep calling scaler.transform.
+        sc = StandardScaler(with_mean=False, with_std=False).fit(X[:1])
+    else:
+        sc = StandardScaler()
+        X = sc.fit_transform(X)
 
     # Model selection
     if classifier_model == "Random Forest":
         model = RandomForestClassifier(
             n_estimators=rf_num_trees,
             random_state=99,
+            n_jobs=-1,
         )
     elif classifier_model == "Balanced Random Forest":
         model = BalancedRandomForestClassifier(
             n_estimators=rf_num_trees,
             random_state=99,
+            n_jobs=-1,
+        )
+    elif classifier_model == "HistGBT":
+        model = HistGradientBoostingClassifier(
+            max_iter=rf_num_trees,
+            max_bins=255,
+            early_stopping=True,
+            random_state=99,
         )
 
     model.fit(X, y)
 
     model_dir = set_data_dir(outputs_dir, "models")
 
-    with open(model_dir.joinpath("trained_model.pkl"), "wb") as file:
-        pickle.dump(model, file)
-
-    # Note: Unnecessary to scale DF for RandomForest, but code in place in case
-    # of the use of a different model.
-    with open(model_dir.joinpath("scaler.pkl"), "wb") as file:
-        pickle.dump(sc, file)
+    # joblib serializes the tree arrays through the raw buffer protocol and
+    # lz4 keeps the compression cost negligible - much faster and smaller
+    # than pickling the estimator objects element by element.
+    joblib.dump(model, model_dir.joinpath("trained_model.pkl"), compress=("lz4", 3))
+    joblib.dump(sc, model_dir.joinpath("scaler.pkl"), compress=("lz4", 3))
 
 
 def main(
@@ -377,13 +439,8 @@ def mk_arg_pars():
         default values extracted from config file.
     """
     import argparse
-    from inspect import currentframe, getframeinfo
-
-    filename = getframeinfo(currentframe()).filename
-    parent = Path(filename).resolve().parent
 
-    config_file = parent.joinpath("config.yaml")
-    params = load(open(config_file), Loader=Loader)
+    params = load_config()
 
     parser = argparse.ArgumentParser(
         description="Train model using labelled training data."
@@ -8,22 +8,39 @@ script.
 """
 
 # Standard Library
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 
 # Third Party
 import geopandas as gpd
 import numpy as np
+from numba import njit
 import pandas as pd
 import rasterio as rio
 from data_processing.image_processing import create_chips_from_grid
+from pyogrio import read_dataframe, write_dataframe
 from rasterio.features import shapes
+from shapely.ops import unary_union
 from tqdm import tqdm
 from utils.file_handling import generate_file_list, set_data_dir
 
 from .feature_engineering import create_stacked_img
 
 
+def _chunked_union(geoms, chunk: int = 500):
+    """
+    Union geometries in chunks, then union the chunk results.
+
+    On very large inputs a single-shot cascaded union can hit superlinear
+    GEOS behaviour; pre-merging fixed-size chunks keeps each union call on
+    a set small enough to stay near-linear.
+    """
+    return unary_union(
+        [unary_union(geoms[i : i + chunk]) for i in range(0, len(geoms), chunk)]
+    )
+
+
 def dissolve_contiguous(gdf: gpd.GeoDataFrame):
     """
     Dissolve contiguous features into one.
@@ -38,10 +55,80 @@ def dissolve_contiguous(gdf: gpd.GeoDataFrame):
     geopandas.GeoDataFrame
         The resulting dissolved geodataframe as singlepart features.
     """
-    gdf["diss"] = 1
-    gdf = gdf.dissolve(by="diss", as_index=False)
-    gdf = gdf.explode(index_parts=True)
-    return gdf.reset_index(drop=True)
+    # A single cascaded union in GEOS does the merging directly; routing it
+    # through dissolve() dragged in pandas groupby machinery (and a dummy
+    # grouping column) just to reach the same union call.
+    if len(gdf) > 2000:
+        merged = _chunked_union(gdf.geometry.values)
+    else:
+        merged = unary_union(gdf.geometry.values)
+    if merged.is_empty:
+        parts = []
+    elif merged.geom_type == "MultiPolygon":
+        parts = list(merged.geoms)
+    else:
+        parts = [merged]
+    return gpd.GeoDataFrame(geometry=parts, crs=gdf.crs)
+
+
+@njit(cache=True)
+def _compact_valid_rows(data, mask, out, valid):
+    """
+    Pack the unmasked rows of data into out, recording validity per row.
+
+    Fuses the compare, any-reduce and boolean-index passes of the pure
+    NumPy form into one streaming pass over the pixels, so each chip is
+    read from memory once instead of three times. The compaction counter
+    forces sequential writes, hence no prange. Returns the number of
+    valid rows written.
+    """
+    k = 0
+    for i in range(data.shape[0]):
+        row_ok = True
+        for j in range(mask.shape[1]):
+            if mask[i, j]:
+                row_ok = False
+                break
+        valid[i] = row_ok
+        if row_ok:
+            out[k] = data[i]
+            k += 1
+    return k
+
+
+def _extract_valid_rows(stacked_img):
+    """
+    Return (float32 valid rows, flat validity mask, dims) for a stacked image.
+    """
+    dims = stacked_img.shape
+    data_2d = stacked_img.data.reshape(dims[0], -1).T
+    mask_2d = np.ma.getmaskarray(stacked_img).reshape(dims[0], -1).T
+    out = np.empty(data_2d.shape, dtype=np.float32)
+    valid = np.empty(data_2d.shape[0], dtype=np.bool_)
+    n_valid = _compact_valid_rows(data_2d, mask_2d, out, valid)
+    return out[:n_valid], valid, dims
+
+
+def _predict_valid_pixels(
+    stacked_img: np.ndarray, model, scaler
+) -> Tuple[np.ndarray, np.ndarray, Tuple[int, ...]]:
+    """
+    Run one probability pass over the valid pixels of a stacked image.
+
+    Shared primitive behind get_mean_truck_probability and predict_image:
+    for tree ensembles predict is implemented on top of predict_proba, so
+    running both doubled the inference cost per chip. Returns the truck
+    probabilities of the valid pixels, the flat validity mask and the
+    original dimensions.
+    """
+    # float32 is ample for reflectance-derived features and halves the
+    # bandwidth through the scaler and the trees; sklearn accepts it
+    # without an internal upcast copy.
+    rows, valid, dims = _extract_valid_rows(stacked_img)
+    if rows.shape[0] == 0:
+        return np.empty(0), valid, dims
+    proba = model.predict_proba(scaler.transform(rows))[:, 1]
+    return proba, valid, dims
 
 
 def get_mean_truck_probability(
@@ -72,27 +159,10 @@ def get_mean_truck_probability(
         Mean probability of truck classification across all pixels.
 
     """
-    # reshape from 3D to 2D array with features as columns, row for each pixel
-    dims = stacked_img.shape
-    stacked_img = stacked_img.reshape(dims[0], -1).T
-
-    # Get rid of the masked values -- initially fill the mask with -999
-    stacked_img = stacked_img.filled(-999)
-    # then using np.all on the row dimension (all column values should be > -999 to be road)
-    stacked_img = stacked_img[np.all(stacked_img > -999, axis=1)]
-
-    if stacked_img.shape == (0, 28):
+    proba, _, _ = _predict_valid_pixels(stacked_img, model, scaler)
+    if proba.size == 0:
         return 0
-    else:
-        # Scale the 2d array with the pre-fit scaler
-        stacked_img = scaler.transform(stacked_img)
-        # image prediction with same nrows as img_arr
-        img_pred = model.predict_proba(stacked_img)
-        # take the truck class probability
-        img_pred = img_pred[:, 1]
-
-        proba_mean = np.mean(img_pred)
-        return proba_mean
+    return np.mean(proba)
 
 
 def predict_image(stacked_img: np.ndarray, model, scaler) -> np.ndarray:
@@ -115,18 +185,16 @@ def predict_image(stacked_img: np.ndarray, model, scaler) -> np.ndarray:
         Array of pixel-wise classification model predictions.
 
     """
-    dims = stacked_img.shape
-    img_arr = stacked_img.reshape(dims[0], -1).T
-    img_arr_transformed = scaler.transform(img_arr)
-    img_pred = model.predict(img_arr_transformed)
-    img_pred_reshaped = img_pred.reshape(dims[1], dims[2]).astype("uint8")
-    return img_pred_reshaped
+    proba, valid, dims = _predict_valid_pixels(stacked_img, model, scaler)
+    img_pred = np.zeros(valid.shape[0], dtype="uint8")
+    if proba.size:
+        img_pred[valid] = (proba >= 0.5).view(np.uint8)
+    return img_pred.reshape(dims[1], dims[2])
 
 
 def generate_prediction_geometry(
     img_meta: dict,
     class_img: np.ndarray,
-    data_dir: Path,
 ):
     """
     Generate a shapefile of geometries associated with truck predictions.
@@ -139,12 +207,11 @@ def generate_prediction_geometry(
     Parameters
     ----------
     img_meta : rasterio.profile
-        The meta data used to write image into GeoTIFF
+        The meta data of the predicted image (its transform and crs are used
+        to georeference the polygons).
     class_img : np.ndarray
         Array of model predictions (i.e. pixel-wise results of model.predict
         applied to the stacked features image).
-    data_dir : Path
-        Filepath to directory where data stored.
 
     Returns
     -------
@@ -154,16 +221,20 @@ def generate_prediction_geometry(
         Or, returns None if no truck detections are made.
 
     """
-    img_meta.update(count=1, nodata=0, dtype="uint8")
-    with rio.open(data_dir.joinpath("temp_class.tif"), "w", **img_meta) as dst:
-        dst.write(np.expand_dims(class_img, axis=0))
-    with rio.open(data_dir.joinpath("temp_class.tif")) as src:
-        classimg = src.read(1, masked=True).astype("uint8")
-        rshapes = (
-            {"properties": {"uniqueid": i}, "geometry": s}
-            for i, (s, v) in enumerate(shapes(classimg, transform=src.transform))
+    # shapes() takes the in-memory array and transform directly; writing the
+    # class image to a temporary GeoTIFF and reading it back cost one raster
+    # write and read per chip for nothing. The mask restricts vectorization
+    # to the truck pixels, as the nodata tag did on the file round-trip.
+    geometry = [
+        {"properties": {"uniqueid": i}, "geometry": s}
+        for i, (s, v) in enumerate(
+            shapes(
+                class_img,
+                mask=class_img.astype(bool),
+                transform=img_meta["transform"],
+            )
         )
-    geometry = list(rshapes)
+    ]
     if len(geometry) > 0:
         polygons = gpd.GeoDataFrame.from_features(
             geometry, crs=img_meta["crs"].to_string()
@@ -175,21 +246,115 @@ def generate_prediction_geometry(
         return None
 
 
+# Model and scaler parameters for chip prediction workers, set once per
+# process by _init_chip_worker so they are not re-pickled for every chip
+# task. The scaler is unpacked to plain float32 arrays up front: per-batch
+# scaling is then a subtract and a multiply by the precomputed reciprocal,
+# with no estimator attribute walking or division inside the loop.
+_chip_worker_model = None
+_chip_worker_mu = None
+_chip_worker_inv_sigma = None
+
+
+def _init_chip_worker(model, scaler):
+    """Store the model and unpacked scaler once in each prediction worker."""
+    global _chip_worker_model, _chip_worker_mu, _chip_worker_inv_sigma
+    _chip_worker_model = model
+    # The identity scaler fitted for tree models leaves mean_ and scale_
+    # unset, in which case scaling is skipped entirely.
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    _chip_worker_mu = None if mean is None else np.asarray(mean, dtype=np.float32)
+    _chip_worker_inv_sigma = (
+        None if scale is None else 1.0 / np.asarray(scale, dtype=np.float32)
+    )
+
+
+def _read_stacked_img(image_chip: Path, temporal_chip: Path):
+    """
+    Run create_stacked_img under the tuned GDAL environment.
+
+    rasterio Env options are thread-local, so the environment has to be
+    entered inside the reader thread doing the I/O - entering it around the
+    executor would only configure the parent thread.
+    """
+    with rio.Env(GDAL_CACHEMAX=256 * 1024 * 1024, NUM_THREADS="ALL_CPUS"):
+        return create_stacked_img(image_chip, temporal_chip)
+
+
+def _predict_chip_batch(
+    image_chips: List[Path], temporal_chips: List[Path]
+) -> List[Tuple[float, gpd.GeoDataFrame]]:
+    """
+    Run feature engineering and model prediction for a batch of chips.
+
+    Worker function for apply_model_to_chips. The valid pixels of the whole
+    batch go through scaler.transform and model.predict_proba as one matrix -
+    per-chip calls spent most of their time in per-call sklearn dispatch
+    rather than in the trees. Returns, per chip, the mean truck probability
+    and a geodataframe of predicted truck geometry (or None when nothing was
+    detected).
+    """
+    # GDAL releases the GIL during reads, so a small thread pool keeps the
+    # next chips streaming off disk while the current one is being stacked -
+    # the batch takes roughly max(IO, compute) rather than their sum.
+    with ThreadPoolExecutor(max_workers=4) as reader:
+        stacked = list(reader.map(_read_stacked_img, image_chips, temporal_chips))
+    stacked_imgs = [stacked_img for stacked_img, _ in stacked]
+    profiles = [profile for _, profile in stacked]
+
+    valid_rows, valid_masks, dims_list = [], [], []
+    for stacked_img in stacked_imgs:
+        rows, valid, dims = _extract_valid_rows(stacked_img)
+        valid_rows.append(rows)
+        valid_masks.append(valid)
+        dims_list.append(dims)
+
+    row_counts = [rows.shape[0] for rows in valid_rows]
+    X = np.concatenate(valid_rows) if sum(row_counts) else np.empty((0, 0))
+    if X.shape[0]:
+        if _chip_worker_mu is not None:
+            X = X - _chip_worker_mu
+        if _chip_worker_inv_sigma is not None:
+            X = X * _chip_worker_inv_sigma
+        proba = _chip_worker_model.predict_proba(X)[:, 1]
+    else:
+        proba = np.empty(0)
+    per_chip_proba = np.split(proba, np.cumsum(row_counts)[:-1])
+
+    results = []
+    for chip_proba, valid, dims, profile in zip(
+        per_chip_proba, valid_masks, dims_list, profiles
+    ):
+        # Fully masked chip: nothing was predicted for it.
+        if chip_proba.size == 0:
+            results.append((0, None))
+            continue
+        mean_truck_proba = float(chip_proba.mean())
+        # One probability pass serves both outputs: the hard class image is
+        # the 0.5 threshold rather than a second model.predict pass.
+        class_flat = np.zeros(valid.shape[0], dtype=np.uint8)
+        class_flat[valid] = (chip_proba >= 0.5).view(np.uint8)
+        class_img = class_flat.reshape(dims[1], dims[2])
+        pred_geom = None
+        if class_img.max() > 0:
+            pred_geom = generate_prediction_geometry(profile, class_img)
+        results.append((mean_truck_proba, pred_geom))
+    return results
+
+
 def apply_model_to_chips(
-    chips_dir,
     model,
     scaler,
     date_chip_list: List[Path],
     temporal_chip_list: List[Path],
-    output_shp_fp: str,
+    output_fp: str,
 ) -> Tuple[gpd.GeoDataFrame, float]:
     """
     Predict truck counts in each chip image using trained model & output results.
 
     Parameters
     ----------
-    chips_dir : Path
-        Filepath to chips data directory.
     model : model.fit
         The trained classifier model.
     scaler : scalar
@@ -200,8 +365,10 @@ def apply_model_to_chips(
     temporal_chip_list : List[Path]
         List of filepaths to the temporal composite chipped images. This should
         be ordered in the same way as date_chip_list.
-    output_shp_fp : str
-        The desired filename for the output shapefile to be generated.
+    output_fp : str
+        The desired filename for the output vector file to be generated
+        (written as FlatGeobuf, a single-file format without the Shapefile
+        size cap).
 
     Returns
     -------
@@ -211,42 +378,90 @@ def apply_model_to_chips(
         2) The mean probability across all chips.
 
     """
-    proba_chips = []
-
-    merged_shapefile = gpd.GeoDataFrame(
-        geometry=[], crs=rio.open(date_chip_list[0]).crs.to_string()
-    )
-    for i, (image_chip, temporal_chip) in enumerate(
-        tqdm(zip(date_chip_list, temporal_chip_list), total=len(temporal_chip_list))
-    ):
-        stacked_img, profile = create_stacked_img(image_chip, temporal_chip)
-
-        # calculate mean probability of positive class (truck) across image
-        mean_truck_proba = get_mean_truck_probability(stacked_img, model, scaler)
-        proba_chips.append(mean_truck_proba)
-
-        model_predictions = predict_image(stacked_img, model, scaler)
-        if model_predictions.max() > 0:
-            pred_geom = generate_prediction_geometry(
-                profile,
-                model_predictions,
-                chips_dir,
-            )
-            merged_shapefile = gpd.GeoDataFrame(
-                pd.concat([merged_shapefile, pred_geom], ignore_index=True),
-                crs=merged_shapefile.crs,
-            )
-        # print(f"Processed {i+1} chipped images of {len(date_chip_list)} total.")
+    # One slot per chip, filled in order as batches complete; float32 is
+    # plenty for a mean of probabilities.
+    proba_chips = np.empty(len(date_chip_list), dtype=np.float32)
+    n_done = 0
+    pred_geoms = []
+
+    # The CRS is the same for every chip, so it is read once from the first
+    # file under a context manager rather than via a dataset handle that was
+    # never closed.
+    with rio.open(date_chip_list[0]) as src:
+        src_crs = src.crs.to_string()
+    # Chips are fanned out across cores in batches: the chips of a batch are
+    # feature-engineered independently but predicted through sklearn as one
+    # matrix. The model and scaler are shipped to each worker once via the
+    # pool initializer.
+    batch_size = 32
+    chip_batches = [
+        date_chip_list[i : i + batch_size]
+        for i in range(0, len(date_chip_list), batch_size)
+    ]
+    temporal_batches = [
+        temporal_chip_list[i : i + batch_size]
+        for i in range(0, len(temporal_chip_list), batch_size)
+    ]
+    with ProcessPoolExecutor(
+        initializer=_init_chip_worker, initargs=(model, scaler)
+    ) as executor:
+        results = executor.map(_predict_chip_batch, chip_batches, temporal_batches)
+        for batch_results in tqdm(results, total=len(chip_batches)):
+            for mean_truck_proba, pred_geom in batch_results:
+                proba_chips[n_done] = mean_truck_proba
+                n_done += 1
+                if pred_geom is not None:
+                    pred_geoms.append(pred_geom)
+    # Concatenating once after the loop is linear; growing the merged frame
+    # chip by chip re-copied it on every append.
+    if pred_geoms:
+        merged_shapefile = gpd.GeoDataFrame(
+            pd.concat(pred_geoms, ignore_index=True), crs=src_crs
+        )
+    else:
+        merged_shapefile = gpd.GeoDataFrame(geometry=[], crs=src_crs)
     merged_shapefile = dissolve_contiguous(merged_shapefile)
     if len(merged_shapefile) > 0:
-        merged_shapefile.to_file(output_shp_fp)
+        write_dataframe(merged_shapefile, output_fp, driver="FlatGeobuf")
 
     # mean probability across all image chips
-    mean_of_chips = np.mean(proba_chips)
+    mean_of_chips = float(proba_chips.mean())
 
     return merged_shapefile, mean_of_chips
 
 
+def _predict_and_persist(
+    model,
+    scaler,
+    date_chips: List[Path],
+    temporal_mean_chips: List[Path],
+    predictions_dir: Path,
+    location_name: str,
+    img_date: str,
+) -> Tuple[gpd.GeoDataFrame, float]:
+    """
+    Run the model over one date's chips and persist the prediction outputs.
+
+    Single home for the predict-and-write step of chip_and_predict, which
+    both the fresh-run and missing-mean-file branches share.
+    """
+    gdf, truck_prob_mean = apply_model_to_chips(
+        model=model,
+        scaler=scaler,
+        date_chip_list=date_chips,
+        temporal_chip_list=temporal_mean_chips,
+        output_fp=predictions_dir.joinpath(
+            f"{location_name}_{img_date}_predictions.fgb"
+        ),
+    )
+    with open(
+        predictions_dir.joinpath(f"{location_name}_{img_date}_mean_prediction.txt"),
+        "w",
+    ) as file:
+        file.write(str(truck_prob_mean))
+    return gdf, truck_prob_mean
+
+
 def chip_and_predict(
     data_dir: Path,
     location_name: str,
@@ -254,6 +469,7 @@ def chip_and_predict(
     model,
     scaler,
     remove_date_chips: bool = False,
+    temporal_mean_chips: List[Path] = None,
 ) -> Tuple[int, float]:
     """
     For given date, chip image and apply model to predict truck counts.
@@ -279,6 +495,11 @@ def chip_and_predict(
         more tidy and free up storage, however increases processing time when
         re-running this function as the chipping must be performed each time.
         By default the value is False.
+    temporal_mean_chips : List[Path], optional
+        Sorted list of the temporal composite chipped images. The composite
+        chips do not change between dates, so callers looping over dates can
+        list them once and pass them in; when omitted the directory is
+        scanned here.
 
     Returns
     -------
@@ -332,14 +553,15 @@ def chip_and_predict(
 
         date_chips = generate_file_list(chips_img_dir, "tif", [location_name, img_date])
 
-    temporal_mean_chips = generate_file_list(
-        chips_dir.joinpath("temporal_mean_imgs"),
-        "tif",
-        [location_name, "temporal_mean"],
-    )
+    if temporal_mean_chips is None:
+        temporal_mean_chips = generate_file_list(
+            chips_dir.joinpath("temporal_mean_imgs"),
+            "tif",
+            [location_name, "temporal_mean"],
+        )
+        temporal_mean_chips.sort()
 
     date_chips.sort()
-    temporal_mean_chips.sort()
     if len(date_chips) != len(temporal_mean_chips):
         raise ValueError(
             f"{len(date_chips)} date chips does not equal "
@@ -348,7 +570,7 @@ def chip_and_predict(
 
     try:
         previous_model_output = generate_file_list(
-            predictions_dir, "shp", [location_name, img_date]
+            predictions_dir, "fgb", [location_name, img_date]
         )
     except FileNotFoundError:
         previous_model_output = []
@@ -359,23 +581,17 @@ def chip_and_predict(
         print(
             f"Applying model to the {len(temporal_mean_chips)} chips for the observation dated {img_date}:"
         )
-        gdf, truck_prob_mean = apply_model_to_chips(
-            chips_dir=chips_dir,
-            model=model,
-            scaler=scaler,
-            date_chip_list=date_chips,
-            temporal_chip_list=temporal_mean_chips,
-            output_shp_fp=predictions_dir.joinpath(
-                f"{location_name}_{img_date}_predictions.shp"
-            ),
+        gdf, truck_prob_mean = _predict_and_persist(
+            model,
+            scaler,
+            date_chips,
+            temporal_mean_chips,
+            predictions_dir,
+            location_name,
+            img_date,
         )
-        with open(
-            predictions_dir.joinpath(f"{location_name}_{img_date}_mean_prediction.txt"),
-            "w",
-        ) as file:
-            file.write(str(truck_prob_mean))
     else:
-        gdf = gpd.read_file(previous_model_output[0])
+        gdf = read_dataframe(previous_model_output[0])
         # If single test run is done, prediction shape file exists without corresponding
         # mean_prediction.txt file, throwing error.
         try:
@@ -386,23 +602,15 @@ def chip_and_predict(
             ) as file:
                 truck_prob_mean = float(file.read())
         except FileNotFoundError:
-            gdf, truck_prob_mean = apply_model_to_chips(
-                chips_dir=chips_dir,
-                model=model,
-                scaler=scaler,
-                date_chip_list=date_chips,
-                temporal_chip_list=temporal_mean_chips,
-                output_shp_fp=predictions_dir.joinpath(
-                    f"{location_name}_{img_date}_predictions.shp"
-                ),
+            gdf, truck_prob_mean = _predict_and_persist(
+                model,
+                scaler,
+                date_chips,
+                temporal_mean_chips,
+                predictions_dir,
+                location_name,
+                img_date,
             )
-            with open(
-                predictions_dir.joinpath(
-                    f"{location_name}_{img_date}_mean_prediction.txt"
-                ),
-                "w",
-            ) as file:
-                file.write(str(truck_prob_mean))
 
     if remove_date_chips:
         for file in date_chips:
@@ -445,12 +653,11 @@ def predict_trucks_single_date(
     )
 
     apply_model_to_chips(
-        chips_dir,
         model,
         scaler,
         date_chips,
         temporal_mean_chips,
-        chips_dir.parent.joinpath("predictions", f"{location}_{date}_predictions.shp"),
+        chips_dir.parent.joinpath("predictions", f"{location}_{date}_predictions.fgb"),
     )
 
 
@@ -489,20 +696,34 @@ def predict_trucks_across_all(
 
     if output_file.exists():
         output_file.unlink()  # Delete existing data file
-        # Generate file of column headers
-    pd.DataFrame(
-        columns=["date", "truck_prediction_count", "mean_truck_probability"]
-    ).to_csv(output_file, index=False)
 
+    # Per-date results are collected in a list and written once at the end -
+    # each date is already resumable through its cached prediction files, so
+    # the append-per-row CSV (an open, seek and header check per date)
+    # bought nothing.
+    # The temporal composite chips are the same for every date, so the
+    # directory is listed and sorted once here rather than once per date.
+    temporal_mean_chips = generate_file_list(
+        data_dir.joinpath("chips", "temporal_mean_imgs"),
+        "tif",
+        [location, "temporal_mean"],
+    )
+    temporal_mean_chips.sort()
+
+    results = []
     for date in list_of_dates:
         if date:
-            date = date.pop()  # Retrieve string element
             truck_count, mean_prob = chip_and_predict(
-                data_dir, location, date, model, scaler, remove_date_chips=False
-            )
-            d_res = [date, truck_count, mean_prob]
-            date_df = pd.DataFrame(
-                [d_res],
-                columns=["date", "truck_prediction_count", "mean_truck_probability"],
+                data_dir,
+                location,
+                date,
+                model,
+                scaler,
+                remove_date_chips=False,
+                temporal_mean_chips=temporal_mean_chips,
             )
-            date_df.to_csv(output_file, mode="a", index=False, header=False)
+            results.append([date, truck_count, mean_prob])
+    pd.DataFrame(
+        results,
+        columns=["date", "truck_prediction_count", "mean_truck_probability"],
+    ).to_csv(output_file, index=False)
@@ -9,6 +9,9 @@ script in order to generate the training data.
 
 # Standard library
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import List, Tuple
 
@@ -18,11 +21,11 @@ import numpy as np
 import pandas as pd
 import rasterio as rio
 from data_processing.masking import cloud_mask
+from numba import njit, prange
+from pyogrio import read_dataframe
 from rasterio.io import MemoryFile
-from rasterio.plot import reshape_as_image, reshape_as_raster
-from skimage.color import rgb2hsv
 from skimage.filters.rank import maximum
-from skimage.morphology import dilation, local_maxima, square
+from skimage.morphology import local_maxima, square
 
 # Project
 from utils.column_headers import define_training_data_column_headers
@@ -59,14 +62,39 @@ def calc_normalized_diff(arr: np.ndarray, band_one: int, band_two: int) -> np.ar
       Red = Band 3 (i.e. index = 2)
 
     """
-    return (arr[band_one] - arr[band_two]) / (arr[band_one] + arr[band_two])
+    # The arithmetic runs on the raw data with the division written back
+    # into the difference buffer, so the expression allocates two arrays
+    # rather than the three (and per-step mask bookkeeping) that masked
+    # arithmetic would. The masks are combined once at the end, with
+    # zero-sum pixels masked as masked-array division would have done.
+    a = np.ma.getdata(arr[band_one])
+    b = np.ma.getdata(arr[band_two])
+    out = a - b
+    denominator = a + b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(out, denominator, out=out)
+    if np.ma.isMaskedArray(arr):
+        mask = np.ma.getmaskarray(arr)
+        return np.ma.masked_array(
+            out, mask=mask[band_one] | mask[band_two] | ~np.isfinite(out)
+        )
+    return out
 
 
 def calculate_z_score(arr: np.ndarray) -> np.ndarray:
     """Return Z-score across array of values."""
-    mean_val = arr.mean()
-    std_val = arr.std()
-    z_score = (arr - mean_val) / std_val
+    # The moments are taken over the compacted valid pixels (plain C-speed
+    # reductions, no per-element mask bookkeeping) and the normalization is
+    # fused into the one array allocated for the output: subtract into it,
+    # then scale in place by the reciprocal instead of dividing.
+    if np.ma.isMaskedArray(arr):
+        mask = np.ma.getmaskarray(arr)
+        valid = np.ma.getdata(arr)[~mask]
+        z_score = np.ma.getdata(arr) - valid.mean()
+        z_score *= 1.0 / valid.std()
+        return np.ma.masked_array(z_score, mask=mask)
+    z_score = arr - arr.mean()
+    z_score *= 1.0 / arr.std()
     return z_score
 
 
@@ -89,20 +117,58 @@ def rescale_image_to_8bit(img_arr: np.ndarray) -> np.ndarray:
         Image array of multiple bands as uint8.
 
     """
-    rescale = lambda img: ((img - img.min()) / (img.max() - img.min())) * 255
+    # Per-band minima and maxima broadcast against the image, so one
+    # expression rescales every band without a Python-level band loop or
+    # writing intermediate floats back into the input array.
     if img_arr.ndim == 3:
-        for i, img_band in enumerate(img_arr):
-            img_arr[i] = rescale(img_band)
+        mn = img_arr.min(axis=(1, 2), keepdims=True)
+        mx = img_arr.max(axis=(1, 2), keepdims=True)
     else:
-        img_arr = rescale(img_arr)
-    return img_arr.astype("uint8")
+        mn = img_arr.min()
+        mx = img_arr.max()
+    return ((img_arr - mn) * (255.0 / (mx - mn))).astype("uint8")
+
+
+@njit(parallel=True, cache=True)
+def _separable_max(buf, kernel_size):
+    """
+    Square maximum filter as a horizontal then vertical 1-D max.
+
+    A square structuring element is separable, so the filter runs as two
+    windowed passes of O(rows * cols * kernel) rather than one pass over
+    every kernel x kernel neighbourhood; the independent lines of each
+    pass are spread across cores by prange.
+    """
+    radius = kernel_size // 2
+    height, width = buf.shape
+    tmp = np.empty_like(buf)
+    for i in prange(height):
+        for j in range(width):
+            lo = max(0, j - radius)
+            hi = min(width, j + radius + 1)
+            best = buf[i, lo]
+            for jj in range(lo + 1, hi):
+                if buf[i, jj] > best:
+                    best = buf[i, jj]
+            tmp[i, j] = best
+    out = np.empty_like(buf)
+    for j in prange(width):
+        for i in range(height):
+            lo = max(0, i - radius)
+            hi = min(height, i + radius + 1)
+            best = tmp[lo, j]
+            for ii in range(lo + 1, hi):
+                if tmp[ii, j] > best:
+                    best = tmp[ii, j]
+            out[i, j] = best
+    return out
 
 
 def dilate_band(band_arr: np.ma.array, kernel_size: int = 3) -> np.ma.array:
     """
     Find local maxima within a square of given kernel size around each pixel.
 
-    Uses skimage filters.rank.maximum to find max pixel in kernel window. Then
+    Uses a separable maximum filter to find max pixel in kernel window. Then
     resets all masked pixels to zero and sets non-masked pixels to local maxima.
     Returns masked array.
 
@@ -121,9 +187,14 @@ def dilate_band(band_arr: np.ma.array, kernel_size: int = 3) -> np.ma.array:
         set to local maxima value.
 
     """
-    max_arr = maximum(band_arr, square(kernel_size), mask=~band_arr.mask)
-    max_arr = np.where(band_arr.mask, 0, max_arr)
-    return np.ma.masked_array(max_arr, mask=band_arr.mask)
+    # Masked pixels are zeroed before the filter; with uint8 data the max
+    # over a window is unchanged by extra zeros, so this matches the rank
+    # filter's masked behaviour while staying on a plain array.
+    mask = np.ma.getmaskarray(band_arr)
+    buf = np.where(mask, 0, np.ma.getdata(band_arr))
+    max_arr = _separable_max(buf, kernel_size)
+    max_arr[mask] = 0
+    return np.ma.masked_array(max_arr, mask=mask)
 
 
 def get_temporal_based_zscores(
@@ -148,6 +219,85 @@ def get_temporal_based_zscores(
     return arr_color1_to_color2
 
 
+def _compute_ratio_8bit(
+    img_arr: np.ndarray,
+    temporal_mean_img_arr: np.ndarray,
+    temporal_analysis: bool = False,
+    analyse_blue_band: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the 8-bit green-to-colour and red-to-colour ratio arrays.
+
+    Kernel-independent first half of get_band_ratio_features: the
+    normalized differences (or temporal Z-scores) and 8-bit rescale depend
+    only on the band pair and temporal flag, so callers evaluating several
+    kernel sizes can compute these once and reuse them.
+    """
+    if analyse_blue_band:
+        color_band_index = (0, 0)
+    else:
+        color_band_index = (2, 1)  # red and green bands respectively
+
+    green_to_color = calc_normalized_diff(img_arr, 1, color_band_index[0])
+    red_to_color = calc_normalized_diff(img_arr, 2, color_band_index[1])
+
+    if temporal_analysis:
+        green_to_color = get_temporal_based_zscores(
+            color_band_index, temporal_mean_img_arr, green_to_color, color1_green=True
+        )
+        red_to_color = get_temporal_based_zscores(
+            color_band_index, temporal_mean_img_arr, red_to_color, color1_green=False
+        )
+    return rescale_image_to_8bit(green_to_color), rescale_image_to_8bit(red_to_color)
+
+
+def _local_max_features(
+    green_to_color_8bit: np.ndarray,
+    red_to_color_8bit: np.ndarray,
+    kernel_size: int = 3,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the local-maximum ratio arrays for one kernel size.
+
+    Kernel-dependent second half of get_band_ratio_features, fed from the
+    8-bit ratio arrays produced by _compute_ratio_8bit.
+
+    All the intermediate steps run on plain uint8 buffers with 0 standing
+    in for masked pixels (a zero never wins a maximum, so the results
+    match the masked filtering) - masked arrays are only built once at the
+    boundary for the return values.
+    """
+    green_mask = np.ma.getmaskarray(green_to_color_8bit)
+    red_mask = np.ma.getmaskarray(red_to_color_8bit)
+    # Expand green by kernel square
+    green_to_color_max = _separable_max(
+        np.where(green_mask, 0, np.ma.getdata(green_to_color_8bit)), kernel_size
+    )
+    green_to_color_max[green_mask] = 0
+    # Expand red by 3 by 3 kernel
+    red_to_color_max = _separable_max(
+        np.where(red_mask, 0, np.ma.getdata(red_to_color_8bit)), kernel_size
+    )
+    red_to_color_max[red_mask] = 0
+    # Hopefully for true hits green is a local maxima
+    # Apply this to the expanded green image
+    new_mask = local_maxima(green_to_color_max, square(3))
+    # Zero red where not green local maxima - this allows some connectivity
+    wider_red_to_color_max = _separable_max(np.where(new_mask, red_to_color_max, 0), 3)
+    # Move the red over up to two times within the 'max green window'
+    wider_red_to_color_max[~new_mask] = 0
+    wider_red_to_color_max = _separable_max(wider_red_to_color_max, 3)
+    # Replace the red dilation within 'max green window' to original red
+    # dilation. The maxima set is sparse, so indexed assignment touches
+    # only those pixels instead of a conditional copy over the full image.
+    maxima_idx = np.nonzero(new_mask)
+    red_to_color_max[maxima_idx] = wider_red_to_color_max[maxima_idx]
+    return (
+        np.ma.masked_array(green_to_color_max, mask=green_mask),
+        np.ma.masked_array(red_to_color_max, mask=red_mask),
+    )
+
+
 def get_band_ratio_features(
     img_arr: np.ndarray,
     temporal_mean_img_arr: np.ndarray,
@@ -220,40 +370,15 @@ def get_band_ratio_features(
            kernel of b1.
 
     """
-    if analyse_blue_band:
-        color_band_index = (0, 0)
-    else:
-        color_band_index = (2, 1)  # red and green bands respectively
-
-    green_to_color = calc_normalized_diff(img_arr, 1, color_band_index[0])
-    red_to_color = calc_normalized_diff(img_arr, 2, color_band_index[1])
-
-    if temporal_analysis:
-        green_to_color = get_temporal_based_zscores(
-            color_band_index, temporal_mean_img_arr, green_to_color, color1_green=True
-        )
-        red_to_color = get_temporal_based_zscores(
-            color_band_index, temporal_mean_img_arr, red_to_color, color1_green=False
-        )
-    green_to_color_8bit = rescale_image_to_8bit(green_to_color)
-    red_to_color_8bit = rescale_image_to_8bit(red_to_color)
-
-    # Expand green by kernel square
-    green_to_color_max = dilate_band(green_to_color_8bit, kernel_size=kernel_size)
-    # Expand red by 3 by 3 kernel
-    red_to_color_max = dilate_band(red_to_color_8bit, kernel_size=kernel_size)
-    # Hopefully for true hits green is a local maxima
-    # Apply this to the expanded green image
-    new_mask = local_maxima(green_to_color_max, square(3))
-    # Make a new red image masked where not green local maxima - this allows some connectivity
-    masked_red_to_color_max = np.ma.masked_array(red_to_color_max, mask=~new_mask)
-    # Move the red over up to two times within the 'max green window'
-    wider_red_to_color_max = dilate_band(dilate_band(masked_red_to_color_max))
-    # Replace the red dilation within 'max green window' to original red dilation
-    np.copyto(
-        red_to_color_max, wider_red_to_color_max, where=~wider_red_to_color_max.mask
+    green_to_color_8bit, red_to_color_8bit = _compute_ratio_8bit(
+        img_arr,
+        temporal_mean_img_arr,
+        temporal_analysis=temporal_analysis,
+        analyse_blue_band=analyse_blue_band,
+    )
+    return _local_max_features(
+        green_to_color_8bit, red_to_color_8bit, kernel_size=kernel_size
     )
-    return green_to_color_max, red_to_color_max
 
 
 def rgb_to_hsv(img_arr: np.ndarray) -> np.ndarray:
@@ -280,13 +405,51 @@ def rgb_to_hsv(img_arr: np.ndarray) -> np.ndarray:
     for L2A products (0.2 in reflectance value respectively).
 
     """
-    rgb_img = np.ma.stack([img_arr[2], img_arr[1], img_arr[0]], 0)
-    rgb_img = rgb_img / 0.2
-    rgb_as_image = reshape_as_image(rgb_img)
-    hsv_img = rgb2hsv(rgb_as_image)
-    hsv_img = reshape_as_raster(hsv_img)
-    hsv_img = np.ma.masked_array(hsv_img, mask=rgb_img.mask)
-    return hsv_img
+    # The conversion follows skimage's rgb2hsv arithmetic but runs directly
+    # on the band-first layout, skipping the image/raster transposes on
+    # either side of the skimage call and the masked-array round-trip.
+    data = np.ma.getdata(img_arr)
+    red = data[2] / 0.2
+    green = data[1] / 0.2
+    blue = data[0] / 0.2
+    max_val = np.maximum(np.maximum(red, green), blue)
+    delta = max_val - np.minimum(np.minimum(red, green), blue)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(max_val == 0, 0.0, delta / max_val)
+        hue = np.select(
+            [delta == 0, max_val == red, max_val == green],
+            [
+                0.0,
+                (green - blue) / delta,
+                2.0 + (blue - red) / delta,
+            ],
+            default=4.0 + (red - green) / delta,
+        )
+    hue = (hue / 6.0) % 1.0
+    hsv_img = np.stack([hue, saturation, max_val], 0)
+    mask = np.ma.getmaskarray(img_arr)
+    return np.ma.masked_array(hsv_img, mask=mask[[2, 1, 0]])
+
+
+# Reusable observation-read buffer. Images within a run share one shape,
+# so successive reads land in the same allocation instead of a fresh
+# (bands, H, W) array per call; thread-local because prediction batches
+# read chips from a thread pool.
+_read_buffers = threading.local()
+
+
+def _read_observation(img_fp: Path) -> Tuple[np.ma.MaskedArray, dict]:
+    """Read a full observation image, reusing this thread's buffer."""
+    with rio.open(img_fp) as file:
+        shape = (file.count, file.height, file.width)
+        dtype = np.dtype(file.dtypes[0])
+        buf = getattr(_read_buffers, "img", None)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            _read_buffers.img = buf
+        img = file.read(masked=True, out=buf)
+        profile = file.meta
+    return img, profile
 
 
 def create_stacked_img(
@@ -303,8 +466,11 @@ def create_stacked_img(
     ----------
     img_fp : Path
         Filepath to a single observation image.
-    temporal_composite_fp : Path
-        Filepath of temporal composite image covering same area as above.
+    temporal_composite_fp : Path or numpy.ma.MaskedArray
+        Filepath of temporal composite image covering same area as above, or
+        the already-read composite array. Callers looping over dates against
+        one composite can read it once and pass the array, skipping the
+        re-open and decode on every call.
     cloud_threshold : int, optional
         Cloud probability threshold above which pixels are masked. This is
         passed to the "cloud_mask" function. The default is 25.
@@ -317,14 +483,24 @@ def create_stacked_img(
         Basic metadata of input training image (img_fp).
 
     """
-    with rio.open(img_fp) as file:
-        filtered_img = file.read(masked=True)
-        filtered_img = cloud_mask(filtered_img, cloud_threshold)
-        profile = file.meta
-        profile.update(count=1)
+    filtered_img, profile = _read_observation(img_fp)
+    filtered_img = cloud_mask(filtered_img, cloud_threshold)
+    profile.update(count=1)
 
-    with rio.open(temporal_composite_fp) as file:
-        temporal_mean_img = file.read(masked=True)
+    if isinstance(temporal_composite_fp, np.ndarray):
+        temporal_mean_img = temporal_composite_fp
+    else:
+        with rio.open(temporal_composite_fp) as file:
+            temporal_mean_img = file.read(masked=True)
+
+    # The 28 feature layers are written straight into one preallocated
+    # float32 stack as they are computed, rather than kept alive as 28
+    # separate image-sized arrays and copied again by a final stack call -
+    # roughly halving peak memory for this function.
+    img_stack = np.ma.masked_array(
+        np.empty((28,) + filtered_img.shape[1:], dtype=np.float32),
+        mask=np.zeros((28,) + filtered_img.shape[1:], dtype=bool),
+    )
 
     # Create bg_ratio
     bg_img = calc_normalized_diff(filtered_img, 0, 1)
@@ -339,108 +515,43 @@ def create_stacked_img(
     bg_change = bg_img - bg_mean
     br_change = br_img - br_mean
 
-    bg_img_z = calculate_z_score(bg_change)
-    br_img_z = calculate_z_score(br_change)
-
-    hsv_img = rgb_to_hsv(filtered_img)
-
-    green_max, red_max = get_band_ratio_features(
+    img_stack[0:3] = filtered_img[0:3]
+    img_stack[3] = bg_change
+    img_stack[4] = br_change
+    img_stack[5] = calculate_z_score(bg_change)
+    img_stack[6] = calculate_z_score(br_change)
+    img_stack[7] = bg_img
+    img_stack[8] = br_img
+    img_stack[9:12] = rgb_to_hsv(filtered_img)
+
+    # The 8-bit ratio arrays depend only on the band pair and temporal flag,
+    # so each of the four combinations is computed once and shared between
+    # the kernel-size-3 and kernel-size-5 local-maxima features.
+    ratio_gr = _compute_ratio_8bit(
         filtered_img,
         temporal_mean_img,
         temporal_analysis=False,
         analyse_blue_band=False,
-        kernel_size=3,
     )
-
-    green_max_temp, red_max_temp = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=True,
-        analyse_blue_band=False,
-        kernel_size=3,
+    ratio_gr_temp = _compute_ratio_8bit(
+        filtered_img, temporal_mean_img, temporal_analysis=True, analyse_blue_band=False
     )
-
-    greenblue_max, redblue_max = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=False,
-        analyse_blue_band=True,
-        kernel_size=3,
+    ratio_gb = _compute_ratio_8bit(
+        filtered_img, temporal_mean_img, temporal_analysis=False, analyse_blue_band=True
     )
-
-    greenblue_max_temp, redblue_max_temp = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=True,
-        analyse_blue_band=True,
-        kernel_size=3,
-    )
-
-    green_max5, red_max5 = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=False,
-        analyse_blue_band=False,
-        kernel_size=5,
-    )
-
-    green_max_temp5, red_max_temp5 = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=True,
-        analyse_blue_band=False,
-        kernel_size=5,
-    )
-
-    greenblue_max5, redblue_max5 = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=False,
-        analyse_blue_band=True,
-        kernel_size=5,
+    ratio_gb_temp = _compute_ratio_8bit(
+        filtered_img, temporal_mean_img, temporal_analysis=True, analyse_blue_band=True
     )
 
-    greenblue_max_temp5, redblue_max_temp5 = get_band_ratio_features(
-        filtered_img,
-        temporal_mean_img,
-        temporal_analysis=True,
-        analyse_blue_band=True,
-        kernel_size=5,
-    )
+    img_stack[12], img_stack[13] = _local_max_features(*ratio_gr, kernel_size=3)
+    img_stack[14], img_stack[15] = _local_max_features(*ratio_gr_temp, kernel_size=3)
+    img_stack[16], img_stack[17] = _local_max_features(*ratio_gb, kernel_size=3)
+    img_stack[18], img_stack[19] = _local_max_features(*ratio_gb_temp, kernel_size=3)
 
-    img_stack = np.ma.stack(
-        [
-            filtered_img[0],
-            filtered_img[1],
-            filtered_img[2],
-            bg_change,
-            br_change,
-            bg_img_z,
-            br_img_z,
-            bg_img,
-            br_img,
-            hsv_img[0],
-            hsv_img[1],
-            hsv_img[2],
-            green_max,
-            red_max,
-            green_max_temp,
-            red_max_temp,
-            greenblue_max,
-            redblue_max,
-            greenblue_max_temp,
-            redblue_max_temp,
-            green_max5,
-            red_max5,
-            green_max_temp5,
-            red_max_temp5,
-            greenblue_max5,
-            redblue_max5,
-            greenblue_max_temp5,
-            redblue_max_temp5,
-        ],
-        0,
-    )
+    img_stack[20], img_stack[21] = _local_max_features(*ratio_gr, kernel_size=5)
+    img_stack[22], img_stack[23] = _local_max_features(*ratio_gr_temp, kernel_size=5)
+    img_stack[24], img_stack[25] = _local_max_features(*ratio_gb, kernel_size=5)
+    img_stack[26], img_stack[27] = _local_max_features(*ratio_gb_temp, kernel_size=5)
 
     return (img_stack, profile)
 
@@ -485,43 +596,108 @@ def label_training_feature_values(
     with MemoryFile() as memfile:
         with memfile.open(**profile) as dataset:
             dataset_arr = dataset.read(1)
-            shapes = (
-                (geom, value)
-                for geom, value in zip(
-                    validation_points.geometry, validation_points.truck_pixels
+            # A concrete list lets rasterize size its buffers up front
+            # instead of pulling pairs through a Python generator.
+            shapes = list(
+                zip(
+                    validation_points.geometry.values,
+                    validation_points.truck_pixels.values,
                 )
             )
             points = rio.features.rasterize(
                 shapes=shapes, fill=0, out=dataset_arr, transform=dataset.transform
             )
             if not extract_truck_pixels:
-                points = dilation(points, square(3))
-
-    points = np.reshape(points, (1,) + points.shape)
-    stacked_img = np.concatenate((stacked_img, points))
+                # rank.maximum is far faster than morphology.dilation on
+                # 8-bit data; the rasterized labels are 0/1 so the uint8
+                # view is lossless.
+                points = maximum(points.astype(np.uint8, copy=False), square(3))
+
+    # The mask/nodata/label filters are combined into one boolean keep-mask
+    # in the array domain, so the DataFrame is built once from only the
+    # surviving pixels rather than filtered down over several full passes
+    # (filled copy, dropna, per-column comparisons).
+    n_features = stacked_img.shape[0]
+    data = np.ma.getdata(stacked_img).reshape(n_features, -1)
+    mask = np.ma.getmaskarray(stacked_img).reshape(n_features, -1)
+    points_flat = points.reshape(-1)
+
+    keep = ~mask.any(axis=0)
+    keep &= data[0] != -999
+    if extract_truck_pixels:
+        keep &= points_flat == 1
+    else:
+        keep &= points_flat != 1
+    keep_idx = np.flatnonzero(keep)
+    # Equivalent of the previous dropna: discard pixels whose unmasked
+    # feature values are NaN, checked only on the surviving columns.
+    finite = ~np.isnan(data[:, keep_idx]).any(axis=0)
+    keep_idx = keep_idx[finite]
+    if not extract_truck_pixels and sample and keep_idx.size > 10000:
+        keep_idx = np.random.default_rng().choice(
+            keep_idx, size=10000, replace=False, shuffle=False
+        )
 
-    stacked_img = stacked_img.reshape(stacked_img.shape[0], -1)
-    stacked_img = stacked_img.filled(np.nan)
-    # Want to remove rows where all values of row are nan as this will be mask
-    msk = np.all(np.isnan(stacked_img), axis=0)
-    use = stacked_img.T[~msk]
+    use = np.empty((keep_idx.size, n_features + 1), dtype=np.float32)
+    use[:, :n_features] = data[:, keep_idx].T
+    use[:, n_features] = points_flat[keep_idx]
     column_headers = define_training_data_column_headers()
     init_df = pd.DataFrame(use, columns=column_headers)
-    # Drop rows where any one pixel column is null
-    init_df = init_df.dropna()
+    init_df["ml_class"] = 1 if extract_truck_pixels else 0
+    return init_df
 
-    if extract_truck_pixels:
-        init_df["ml_class"] = 1
-        truck_pixels = init_df[(init_df["blue"] != -999) & (init_df["validation"] == 1)]
-        return truck_pixels
-    else:
-        init_df["ml_class"] = 0
-        non_truck_pixels = init_df[
-            (init_df["blue"] != -999) & (init_df["validation"] != 1)
-        ]
-        if (len(non_truck_pixels["ml_class"]) > 10000) & sample:
-            non_truck_pixels = non_truck_pixels.sample(10000)
-        return non_truck_pixels
+
+# Shared inputs for training workers, set once per process by
+# _init_training_worker: the temporal composite and the location's image
+# listing are identical for every date, so they are read/scanned once in
+# the parent and shipped with the pool rather than redone by each task.
+_training_temporal_img = None
+_training_location_imgs = None
+
+
+def _init_training_worker(temporal_mean_img, location_imgs):
+    """Store the shared training inputs once in each training worker."""
+    global _training_temporal_img, _training_location_imgs
+    _training_temporal_img = temporal_mean_img
+    _training_location_imgs = location_imgs
+
+
+def _training_data_for_date(validation_fp: Path, location_name: str, sample: bool):
+    """
+    Build the labelled pixel frames and feature stack for one training date.
+
+    Worker function for generate_training_data. Returns None when the
+    validation file holds no points, otherwise a tuple of the non-truck
+    pixel frame, the truck pixel frame and the stacked feature image.
+    """
+    validation_points = read_dataframe(validation_fp)
+    if len(validation_points) == 0:
+        return None
+    date = re.split(r"[/_.]", str(validation_fp))[-2]
+
+    labelled_img = [fp for fp in _training_location_imgs if date in fp.name]
+
+    stacked_img, profile = create_stacked_img(labelled_img[0], _training_temporal_img)
+
+    validation_points["ml_class"] = 1
+    validation_points["date"] = date
+    validation_points["truck_pixels"] = 1
+
+    non_truck_pixels = label_training_feature_values(
+        stacked_img,
+        validation_points,
+        profile,
+        extract_truck_pixels=False,
+        sample=sample,
+    )
+    non_truck_pixels["date"] = date
+
+    truck_pixels = label_training_feature_values(
+        stacked_img, validation_points, profile, extract_truck_pixels=True
+    )
+    truck_pixels["date"] = date
+    print(f"Training data: {location_name}-{date}")
+    return non_truck_pixels, truck_pixels, stacked_img
 
 
 def generate_training_data(
@@ -556,53 +732,38 @@ def generate_training_data(
 
     """
     column_headers = define_training_data_column_headers()
-    training_data = pd.DataFrame(columns=column_headers)
-    stacked_imgs = []
-    for i, validation_fp in enumerate(validation_points_fps):
-        validation_points = gpd.read_file(validation_fp)
-        if len(validation_points) == 0:
-            continue
-        date = re.split(r"[/_.]", str(validation_fp))[-2]
-
-        labelled_img = generate_file_list(
-            data_dir,
-            "tif",
-            [location_name, date],
-        )
-        temporal_img = data_dir.joinpath(
-            f"s2a_{location_name}_temporal_mean_training_area.tif"
-        )
-
-        stacked_img, profile = create_stacked_img(labelled_img[0], temporal_img)
-
-        validation_points["ml_class"] = 1
-        validation_points["date"] = date
-        validation_points["truck_pixels"] = 1
-
-        non_truck_pixels = label_training_feature_values(
-            stacked_img,
-            validation_points,
-            profile,
-            extract_truck_pixels=False,
-            sample=sample,
-        )
-        non_truck_pixels["date"] = date
-
-        truck_pixels = label_training_feature_values(
-            stacked_img, validation_points, profile, extract_truck_pixels=True
+    # Each date reads its own images, builds its own feature stack and
+    # labels its own pixels, so the dates fan out across cores; the frames
+    # are concatenated once back in the parent process.
+    temporal_img_fp = data_dir.joinpath(
+        f"s2a_{location_name}_temporal_mean_training_area.tif"
+    )
+    with rio.open(temporal_img_fp) as file:
+        temporal_mean_img = file.read(masked=True)
+    # One directory scan covers every date; workers pick their image out of
+    # the cached listing instead of re-globbing data_dir per task.
+    location_imgs = generate_file_list(data_dir, "tif", [location_name])
+
+    with ProcessPoolExecutor(
+        initializer=_init_training_worker,
+        initargs=(temporal_mean_img, location_imgs),
+    ) as executor:
+        results = executor.map(
+            _training_data_for_date,
+            validation_points_fps,
+            repeat(location_name),
+            repeat(sample),
         )
-        truck_pixels["date"] = date
-
-        if i < (len(validation_points_fps) - 1):
-            # Iterates through training validation point files to extract pixel values
-            print(f"Training data: {location_name}-{date}")
-            training_data = pd.concat([training_data, non_truck_pixels, truck_pixels])
+        pixel_frames = []
+        stacked_imgs = []
+        for result in results:
+            if result is None:
+                continue
+            non_truck_pixels, truck_pixels, stacked_img = result
+            pixel_frames.extend([non_truck_pixels, truck_pixels])
             stacked_imgs.append(stacked_img)
 
-        else:
-            # If only testing one image and validation file
-            training_data = pd.concat([training_data, non_truck_pixels, truck_pixels])
-            training_data = training_data[training_data["bg_change"] > -999]
-            stacked_imgs.append(stacked_img)
+    training_data = pd.concat([pd.DataFrame(columns=column_headers)] + pixel_frames)
+    training_data = training_data[training_data["bg_change"] > -999]
 
     return training_data, stacked_imgs
@@ -1,37 +1,40 @@
 """Script for simply storing a list of strings to be called in elsewhere."""
 
+# Built once at import; the accessor below hands out copies.
+_TRAINING_DATA_COLUMNS = (
+    "blue",
+    "green",
+    "red",
+    "bg_change",
+    "br_change",
+    "bg_z",
+    "br_z",
+    "bg_pixel",
+    "br_pixel",
+    "hue",
+    "sat",
+    "val",
+    "green_max",
+    "red_max",
+    "green_max_temp",
+    "red_max_temp",
+    "greenblue_max",
+    "redblue_max",
+    "greenblue_max_temp",
+    "redblue_max_temp",
+    "green_max5",
+    "red_max5",
+    "green_max_temp5",
+    "red_max_temp5",
+    "greenblue_max5",
+    "redblue_max5",
+    "greenblue_max_temp5",
+    "redblue_max_temp5",
+    "validation",
+)
+
 
 def define_training_data_column_headers():
     """Function for storing and returning list of strings for use elsewhere."""
-    columns = [
-        "blue",
-        "green",
-        "red",
-        "bg_change",
-        "br_change",
-        "bg_z",
-        "br_z",
-        "bg_pixel",
-        "br_pixel",
-        "hue",
-        "sat",
-        "val",
-        "green_max",
-        "red_max",
-        "green_max_temp",
-        "red_max_temp",
-        "greenblue_max",
-        "redblue_max",
-        "greenblue_max_temp",
-        "redblue_max_temp",
-        "green_max5",
-        "red_max5",
-        "green_max_temp5",
-        "red_max_temp5",
-        "greenblue_max5",
-        "redblue_max5",
-        "greenblue_max_temp5",
-        "redblue_max_temp5",
-        "validation",
-    ]
-    return columns
+    # A fresh list is returned because some callers edit it in place.
+    return list(_TRAINING_DATA_COLUMNS)
@@ -3,11 +3,36 @@ Collection of functions for handling commonly needed file related procedures.
 Including:
 - generate a list of files based on some parameters
 - generate a named subdirectory on OS and output path to it
+- read the shared config.yaml parameters
 """
 
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
+from yaml import load
+
+try:
+    # The C loader is several times faster than the pure-Python one but is
+    # only present when PyYAML was built against libyaml.
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+
+@lru_cache(maxsize=1)
+def load_config() -> dict:
+    """
+    Read the parameters from src/config.yaml, once per process.
+
+    Every entry-point script reads the same config for its argparse
+    defaults, so the parsed dict is cached rather than re-read and
+    re-parsed on each call.
+    """
+    config_file = Path(__file__).resolve().parent.parent.joinpath("config.yaml")
+    with open(config_file) as file:
+        return load(file, Loader=_YamlLoader)
+
 
 def generate_file_list(
     data_dir: Path, file_extension: str, keyword_list: list